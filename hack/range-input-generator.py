@@ -18,52 +18,133 @@ limitations under the License.
 # this script is used to generate large input dataset for simulator, python3
 # required.
 import sys
-import csv
+import math
 import os
 from itertools import combinations_with_replacement as combinations
 
+import numpy as np
+
+# numba only accelerates the unranking kernel, fall back to plain numpy when
+# it is not installed
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
 # python3 is requried
 assert sys.version_info[0] >= 3
 
 from utils import print_progress_bar
 
+# resolve the script directory once, realpath stats every path component
+script_dir = os.path.dirname(os.path.realpath(__file__))
+
+
+if njit is not None:
+    # decode every rank independently, one thread per chunk of ranks
+    @njit(cache=True, parallel=True)
+    def _unrank_kernel(total, upper, k, tables, indices):
+        for rank in prange(total):
+            remainder = total - 1 - rank
+            for position in range(k):
+                table = tables[k - position]
+                digit = np.searchsorted(table, remainder, side='right') - 1
+                remainder -= table[digit]
+                indices[rank, position] = upper - 1 - digit - position
+else:
+    _unrank_kernel = None
+
+
+# helper function unranks ranks 0..total-1 into all lexicographic combinations
+# with replacement of k values out of n, as one (total, k) index matrix instead
+# of one Python tuple at a time
+def unrank_combinations(total, n, k):
+    upper = n + k - 1
+    # the lexicographic rank of a strictly increasing k-combination equals
+    # C(upper, k)-1 minus the colexicographic rank of its reversed complement,
+    # so mirror the ranks and decode them with the combinatorial number system
+    # using one binomial table per digit position
+    tables = np.array([[math.comb(v, degree) for v in range(upper + 1)]
+                       for degree in range(k + 1)], dtype=np.int64)
+    indices = np.empty((total, k), dtype=np.int64)
+    if _unrank_kernel is not None:
+        _unrank_kernel(total, upper, k, tables, indices)
+        return indices
+    remainder = (total - 1) - np.arange(total, dtype=np.int64)
+    for position in range(k):
+        table = tables[k - position]
+        digit = np.searchsorted(table, remainder, side='right') - 1
+        remainder = remainder - table[digit]
+        indices[:, position] = upper - 1 - digit
+    # map strictly increasing combinations back to combinations with
+    # replacement
+    indices -= np.arange(k, dtype=np.int64)
+    return indices
+
 
 # helper function helps generate one category of range inputs, default nodes =
 # 30 and endpoints range from 0-100 for three zones
-def generate_one_section(writer,nodes=[30, 30, 30], ep_range=[0,101], step=1, suffix='', bar=True):
-    name = 0
+def generate_one_section(out_file,nodes=[30, 30, 30], ep_range=[0,101], step=1, suffix='', bar=True):
     section_name = "{0}-{1} endpoints {2} nodes, step: {3}".format(ep_range[0], ep_range[1]-1, nodes, step)
-    endpoints = list(combinations(range(ep_range[0], ep_range[1], step), len(nodes)))
-    total = len(endpoints)
-    for comb in endpoints:
-        # exclude cases where there are no endpoints at all
-        if comb == (0,) * len(comb):
-            continue
-        row_data = dict()
-        row_data[field_names[0]] = str(name) + suffix
-        for index, ep in enumerate(comb):
-            row_data[field_names[index+1]] = "{node} {endpoint}".format(node=nodes[index], endpoint=ep)
-        writer.writerow(row_data)
-        name += 1
-        if bar:
-            print_progress_bar(name, total, progress=section_name, length = 70)
-
-file_dir = os.path.normpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), "../data/range-input.csv"))
-print("creating range input to :" + file_dir)
-with open(file_dir, mode='w') as csv_file:
-    field_names = ['name', 'zone1', 'zone2', 'zone3']
-    writer = csv.DictWriter(csv_file, fieldnames=field_names)
-
-    writer.writeheader()
-    # generate range input: 3 zones
-    # nodes are the conbinations from 1-10
-    # endpoints range from 0-100 with step = 1
-    nodes_comb = list(combinations(range(1, 11), 3))
-    for index, nodes in enumerate(nodes_comb):
-        generate_one_section(writer, nodes, suffix='-'+str(nodes), bar=False)
-        print_progress_bar(index+1, len(nodes_comb), progress="0-100 endpoints 1-10 nodes, step: 1")
-
-    # generate range input: 3 zones
-    # nodes = 30 for every zone
-    # endpoints range from 100-1000 with step = 7
-    generate_one_section(writer, ep_range=[100, 1001], step = 7, suffix='-high')
+    num_values = len(range(ep_range[0], ep_range[1], step))
+    total = math.comb(num_values + len(nodes) - 1, len(nodes))
+    endpoints = ep_range[0] + unrank_combinations(total, num_values, len(nodes)) * step
+    # the only combination without any endpoints at all is rank 0 when the
+    # range starts at 0, exclude it
+    skip = 1 if ep_range[0] == 0 else 0
+    total -= skip
+    # keep the endpoints as per-zone contiguous columns so every format step
+    # below is one vectorized pass over the whole section
+    values = endpoints[skip:]
+    # a name containing a comma must be quoted to stay a single csv field
+    quote = '"' if ',' in suffix else ''
+    rows = np.char.add(np.char.add(quote, np.arange(total).astype('U')), suffix + quote)
+    for index, node in enumerate(nodes):
+        rows = np.char.add(rows, np.char.add(",{0} ".format(node), values[:, index].astype('U')))
+    if bar:
+        print_progress_bar(total, total, progress=section_name, length = 70)
+    # the rows are pure ascii, encode and write the section as one bytes block
+    out_file.write(("\r\n".join(rows.tolist()) + "\r\n").encode('ascii'))
+
+# cache key of the generated file, stored next to it so reruns with the same
+# parameters can skip the generation, bump it when the sections below change
+generation_key = "v1: 3 zones, nodes 1-10 with 0-100 endpoints step 1, nodes 30 with 100-1000 endpoints step 7"
+
+# generate the whole range input dataset to output_path
+def build_range_input(output_path):
+    # write bytes through a large buffer, the rows never leave ascii so the
+    # text codec machinery is skipped entirely
+    with open(output_path, mode='wb', buffering=1<<20) as csv_file:
+        field_names = ['name', 'zone1', 'zone2', 'zone3']
+        csv_file.write((",".join(field_names) + "\r\n").encode('ascii'))
+        # generate range input: 3 zones
+        # nodes are the conbinations from 1-10
+        # endpoints range from 0-100 with step = 1
+        total_nodes_comb = math.comb(10, 3)
+        for index, nodes in enumerate(combinations(range(1, 11), 3), 1):
+            generate_one_section(csv_file, nodes, suffix='-'+str(nodes), bar=False)
+            print_progress_bar(index, total_nodes_comb, progress="0-100 endpoints 1-10 nodes, step: 1")
+
+        # generate range input: 3 zones
+        # nodes = 30 for every zone
+        # endpoints range from 100-1000 with step = 7
+        generate_one_section(csv_file, ep_range=[100, 1001], step = 7, suffix='-high')
+
+def main():
+    file_dir = os.path.normpath(os.path.join(script_dir, "../data/range-input.csv"))
+    key_path = file_dir + '.key'
+    if os.path.exists(file_dir):
+        try:
+            with open(key_path, mode='r') as key_file:
+                if key_file.read() == generation_key:
+                    print("range input at {0} already matches the generation parameters, skipping".format(file_dir))
+                    return
+        except OSError:
+            pass
+    print("creating range input to :" + file_dir)
+    build_range_input(file_dir)
+    with open(key_path, mode='w') as key_file:
+        key_file.write(generation_key)
+
+if __name__ == "__main__":
+    main()
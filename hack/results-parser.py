@@ -20,104 +20,84 @@ limitations under the License.
 import sys
 import csv
 import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
 
 # python3 is requried
 assert sys.version_info[0] >= 3
 
 from utils import print_progress_bar
 
-class metric:
-    def __init__(self):
-        self.value = 0.
-        self.max_value = float("-inf")
-        self.min_value = float("inf")
-        self.max_cases = list()
-        self.min_cases = list()
-    def process(self, name, value):
-        self.value += value
-        if value > self.max_value:
-            self.max_value = value
-            self.max_cases.clear()
-        if value == self.max_value:
-            self.max_cases.append(name)
-
-        if value < self.min_value:
-            self.min_value = value
-            self.min_cases.clear()
-        if value == self.min_value:
-            self.min_cases.append(name)
+# resolve the script directory once, realpath stats every path component
+script_dir = os.path.dirname(os.path.realpath(__file__))
 
-# helper function helps calculate aggregate results of an algorithm
-def process_one_file(file_path, writer, alg_name, detail_writer=None):
+# helper function helps calculate aggregate results of an algorithm, returns
+# the aggregate row and the max deviation detail text so files can be
+# processed in parallel and written serially
+def process_one_file(file_path, alg_name):
     file_path = file_path.strip()
-    file_path = os.path.normpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), "./{0}".format(file_path)))
+    file_path = os.path.normpath(os.path.join(script_dir, "./{0}".format(file_path)))
     try:
-        with open(file_path, mode='r') as csv_file:
-            valid_records = 0
-            invalid_records = 0
-            # score aggregate results
-            total_score = metric()
-            inzone_score = metric()
-            deviation_score = metric()
-            slice_score = metric()
-            max_deviation = metric()
-            csv_reader = csv.DictReader(csv_file)
-            for row in csv_reader:
-                if row['score'] == 'invalid':
-                    invalid_records += 1
-                    continue
-                valid_records += 1
-                total_score.process(row['input name'], float(row['score']))
-                inzone_score.process(row['input name'], float(row['in-zone-traffic score']))
-                deviation_score.process(row['input name'], float(row['deviation score']))
-                slice_score.process(row['input name'], float(row['slice score']))
-                max_deviation.process(row['input name'], float(row['max deviation'].strip('%')))
-            row_data = dict()
-            row_data['alg name'] = alg_name
-            row_data['invalid cases'] = invalid_records
-            row_data['valid cases'] = valid_records
-            row_data['mean total score'] = "%.2f" % float(total_score.value/valid_records)
-            row_data['max total score'] = "%.2f" % float(total_score.max_value)
-            row_data['min total score'] = "%.2f" % float(total_score.min_value)
-            row_data['mean inzone score'] = "%.2f" % float(inzone_score.value/valid_records)
-            row_data['max inzone score'] = "%.2f" % float(inzone_score.max_value)
-            row_data['min inzone score'] = "%.2f" % float(inzone_score.min_value)
-            row_data['mean deviation score'] = "%.2f" % float(deviation_score.value/valid_records)
-            row_data['max deviation score'] = "%.2f" % float(deviation_score.max_value)
-            row_data['min deviation score'] = "%.2f" % float(deviation_score.min_value)
-            row_data['mean slice score'] = "%.2f" % float(slice_score.value/valid_records)
-            row_data['max slice score'] = "%.2f" % float(slice_score.max_value)
-            row_data['min slice score'] = "%.2f" % float(slice_score.min_value)
-            row_data['max deviation %'] = "%.2f" % float(max_deviation.max_value) + '%'
-            row_data['average max deviation %'] = "%.2f" % float(max_deviation.value/valid_records) + '%'
-            writer.writerow(row_data)
-            if max_deviation.max_value > 0 and detail_writer != None:
-                detail_writer.write(alg_name + " : ")
-                detail_writer.write("{0} max deviation cases : \n{1}\n".format(len(max_deviation.max_cases), max_deviation.max_cases))
+        # parse and convert the whole file in pandas, the '%' suffix is
+        # stripped by a converter at read time so no per-row float() calls
+        # remain in Python
+        converters = {'max deviation': lambda s: float(s.rstrip('%')) if s != 'invalid' else float('nan')}
+        data = pd.read_csv(file_path, converters=converters)
+        valid = data[data['score'] != 'invalid']
+        invalid_records = len(data) - len(valid)
+        valid_records = len(valid)
+        names = valid['input name'].tolist()
+        total_score = valid['score'].astype(float).to_numpy()
+        inzone_score = valid['in-zone-traffic score'].astype(float).to_numpy()
+        deviation_score = valid['deviation score'].astype(float).to_numpy()
+        slice_score = valid['slice score'].astype(float).to_numpy()
+        max_deviation = valid['max deviation'].to_numpy()
+        row_data = dict()
+        row_data['alg name'] = alg_name
+        row_data['invalid cases'] = invalid_records
+        row_data['valid cases'] = valid_records
+        row_data['mean total score'] = "%.2f" % (total_score.sum()/valid_records)
+        row_data['max total score'] = "%.2f" % total_score.max()
+        row_data['min total score'] = "%.2f" % total_score.min()
+        row_data['mean inzone score'] = "%.2f" % (inzone_score.sum()/valid_records)
+        row_data['max inzone score'] = "%.2f" % inzone_score.max()
+        row_data['min inzone score'] = "%.2f" % inzone_score.min()
+        row_data['mean deviation score'] = "%.2f" % (deviation_score.sum()/valid_records)
+        row_data['max deviation score'] = "%.2f" % deviation_score.max()
+        row_data['min deviation score'] = "%.2f" % deviation_score.min()
+        row_data['mean slice score'] = "%.2f" % (slice_score.sum()/valid_records)
+        row_data['max slice score'] = "%.2f" % slice_score.max()
+        row_data['min slice score'] = "%.2f" % slice_score.min()
+        row_data['max deviation %'] = "%.2f" % max_deviation.max() + '%'
+        row_data['average max deviation %'] = "%.2f" % (max_deviation.sum()/valid_records) + '%'
+        detail = None
+        if max_deviation.max() > 0:
+            max_cases = [names[i] for i in np.flatnonzero(max_deviation == max_deviation.max())]
+            detail = alg_name + " : " + "{0} max deviation cases : \n{1}\n".format(len(max_cases), max_cases)
+        return row_data, detail
     except Exception as err:
         print(err, ", move to the next file")
+        return None, None
 
 # ask user to specify file names for different algorithms
 def user_input_files(alg_output_files, alg_names):
-    print("current output files for {0} are :\n{1}".format(alg_names, alg_output_files))
-    change = input("change files? y/n\n")
-    if change == 'y':
-        change = True
-    elif change == 'n':
-        change = False
-    else:
-        print("unexpected input\n")
-        return user_input_files(alg_output_files, alg_names)
+    while True:
+        print("current output files for {0} are :\n{1}".format(alg_names, alg_output_files))
+        change = input("change files? y/n\n")
+        if change == 'n':
+            return alg_output_files
+        if change != 'y':
+            print("unexpected input\n")
+            continue
 
-    if change == False:
-        return alg_output_files
-    
-    new_files = input("input {0} files names (use comma to seperate each):\n".format(len(alg_names)))
-    new_files = new_files.split(',')
-    if len(new_files) != len(alg_names) :
-        print("unmatched number of files for {0} algorithms\n".format(len(alg_names)))
-        return user_input_files(alg_output_files, alg_names)
-    return new_files
+        new_files = input("input {0} files names (use comma to seperate each):\n".format(len(alg_names)))
+        new_files = new_files.split(',')
+        if len(new_files) != len(alg_names) :
+            print("unmatched number of files for {0} algorithms\n".format(len(alg_names)))
+            continue
+        return new_files
 
 def main():
     alg_names = ['original', 'local', 'local-shared', 'local-weighted', 'local-opt', 'shared-global', 'shared-multizone']
@@ -128,7 +108,7 @@ def main():
     print("---"*10)
     print("processing files : {0}".format(alg_output_files))
 
-    output_dir = os.path.normpath(os.path.dirname(os.path.realpath(__file__)))
+    output_dir = script_dir
     output_path = os.path.join(output_dir, "../data/results.csv")
     try:
         with open(output_path, mode='w') as csv_output:
@@ -136,9 +116,16 @@ def main():
             writer = csv.DictWriter(csv_output, fieldnames=field_names)
             writer.writeheader()
             detail_writer = open(os.path.join(output_dir, "../data/details.out"), 'w')
-            for index, alg_name in enumerate(alg_names):
-                process_one_file(alg_output_files[index], writer, alg_name, detail_writer)
-                print_progress_bar(index+1, len(alg_names), length=10)
+            # the algorithm files are independent, parse them in parallel and
+            # write the returned rows serially to keep the output order
+            with ProcessPoolExecutor() as executor:
+                results = executor.map(process_one_file, alg_output_files, alg_names)
+                for index, (row_data, detail) in enumerate(results, 1):
+                    if row_data != None:
+                        writer.writerow(row_data)
+                    if detail != None:
+                        detail_writer.write(detail)
+                    print_progress_bar(index, len(alg_names), length=10)
             detail_writer.close()
     except Exception as err:
         print(err)